@@ -1,11 +1,17 @@
+import os
 import sys
 import logging
 
 from PyQt5 import QtGui
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QKeySequence
 from PyQt5.QtWidgets import \
-    QApplication, QPushButton, QLineEdit, QFileDialog, \
-    QProgressBar, QGridLayout, QWidget, QTextEdit, QComboBox
+    QApplication, QPushButton, QLineEdit, QFileDialog, QAction, QAbstractItemView, \
+    QProgressBar, QGridLayout, QWidget, QListView, QComboBox, QCheckBox
 from EncryptionApp.communicator import Communicator
+from EncryptionApp.message_log import MessageLog, SENT, RECEIVED, history_path
+from EncryptionApp.message_type import MessageType
+from EncryptionApp.GUI.chat_model import ChatModel
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +22,13 @@ class App(QWidget):
         self.setWindowTitle(f"Encryption application ({'server' if as_server else 'client'})")
         self.as_server = as_server
         self.communicator = Communicator()
+        self.message_log = None
+        self.chat_model = None
+        self.flush_timer = QTimer(self)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.search_chat)
         self.buttons = []
         self.keys_buttons = []
         self.connect_button = None
@@ -25,6 +38,8 @@ class App(QWidget):
         self.sending_progress = None
         self.sending_mode = None
         self.chat = None
+        self.search_box = None
+        self.history_box = None
         self.receiving_progress = None
         self.pass_box = None
         self.pass_button = None
@@ -44,6 +59,9 @@ class App(QWidget):
         layout.addWidget(self.pass_box, 0, 0)
         layout.addWidget(self.pass_button, 0, 1)
 
+        self.history_box = QCheckBox("Save chat history to disk", self)
+        layout.addWidget(self.history_box, 0, 2)
+
         generate_new_keys_button = QPushButton("Generate new keys", self)
         generate_new_keys_button.resize(generate_new_keys_button.minimumSizeHint())
         generate_new_keys_button.clicked.connect(self.generate_keys)
@@ -98,9 +116,23 @@ class App(QWidget):
         layout.addWidget(self.sending_mode, 8, 3)
         self.disable_sending()
 
-        self.chat = QTextEdit(self)
-        self.chat.setReadOnly(True)
-        layout.addWidget(self.chat, 9, 0, 3, 3)
+        self.search_box = QLineEdit(self)
+        self.search_box.setPlaceholderText("Search history")
+        self.search_box.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_box.setEnabled(False)
+        layout.addWidget(self.search_box, 9, 0, 1, 3)
+
+        self.chat = QListView(self)
+        self.chat.setUniformItemSizes(True)
+        self.chat.setWordWrap(False)
+        self.chat.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        copy_action = QAction("Copy", self.chat)
+        copy_action.setShortcut(QKeySequence.Copy)
+        copy_action.setShortcutContext(Qt.WidgetShortcut)
+        copy_action.triggered.connect(self.copy_chat)
+        self.chat.addAction(copy_action)
+        self.chat.setContextMenuPolicy(Qt.ActionsContextMenu)
+        layout.addWidget(self.chat, 10, 0, 3, 3)
 
     def confirm_password(self):
         self.communicator.password = self.pass_box.text()
@@ -108,8 +140,21 @@ class App(QWidget):
         self.pass_box.clear()
         self.pass_box.setEnabled(False)
         self.pass_button.setEnabled(False)
+        self.open_history()
         self.enable_keys_buttons()
 
+    def open_history(self):
+        path = history_path(self.as_server) if self.history_box.isChecked() else ""
+        self.history_box.setEnabled(False)
+        self.message_log = MessageLog(path)
+        self.chat_model = ChatModel(self.message_log)
+        self.chat.setModel(self.chat_model)
+        self.chat_model.modelReset.connect(self.chat.scrollToBottom)
+        self.chat.scrollToBottom()
+        self.flush_timer.timeout.connect(self.flush_history)
+        self.flush_timer.start(1000)
+        self.search_box.setEnabled(True)
+
     def generate_keys(self):
         self.communicator.generate_keys()
         self.connect_button.setEnabled(True)
@@ -138,14 +183,42 @@ class App(QWidget):
         self.connect_button.setEnabled(False)
         logger.info("Connected")
 
-    def update_chat(self, data: str):
-        self.chat.append(data)
-        logger.info(f"Updated chat with value: {data}")
+    def search_chat(self):
+        self.chat_model.set_query(self.search_box.text())
+
+    def copy_chat(self):
+        if not self.chat_model:
+            return
+        rows = sorted(index.row() for index in self.chat.selectionModel().selectedIndexes())
+        entries = (self.chat_model.entry(row) for row in rows)
+        QApplication.clipboard().setText("\n".join(ChatModel.format_entry(entry) for entry in entries if entry))
+
+    def update_chat(self, data: tuple):
+        kind, body = data
+        self.add_to_chat(RECEIVED, kind, body)
+        logger.info(f"Updated chat with value: {body}")
+
+    def add_to_chat(self, direction: str, kind: MessageType, body: str) -> None:
+        at_bottom = self.chat_at_bottom()
+        self.chat_model.append(direction, kind.name, body)
+        if at_bottom:
+            self.chat.scrollToBottom()
+
+    def flush_history(self) -> None:
+        at_bottom = self.chat_at_bottom()
+        self.message_log.flush()
+        self.chat_model.refresh()
+        if at_bottom:
+            self.chat.scrollToBottom()
+
+    def chat_at_bottom(self) -> bool:
+        return self.chat.verticalScrollBar().value() == self.chat.verticalScrollBar().maximum()
 
     def send_message(self) -> None:
         message = self.message_box.text()
         mode = self.sending_mode.currentText()
         self.communicator.send_text(message, mode)
+        self.add_to_chat(SENT, MessageType.TEXT, message)
         self.message_box.clear()
         logger.info(f"Sent message: {message}. Mode: {mode}")
 
@@ -154,6 +227,7 @@ class App(QWidget):
         mode = self.sending_mode.currentText()
         self.sending_progress.setValue(0)
         self.communicator.send_file(filename, mode, self.sending_progress)
+        self.add_to_chat(SENT, MessageType.FILE, os.path.basename(filename))
         self.filename_box.clear()
         logger.info(f"Sent file: {filename}. Mode: {mode}")
 
@@ -174,6 +248,10 @@ class App(QWidget):
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         if self.communicator:
             self.communicator.close_connection()
+        self.flush_timer.stop()
+        self.search_timer.stop()
+        if self.message_log:
+            self.message_log.close()
         event.accept()
         logger.info("Closed app")
 
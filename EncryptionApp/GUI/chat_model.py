@@ -0,0 +1,133 @@
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Optional
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from EncryptionApp.message_log import MessageLog, LogEntry, SENT
+from EncryptionApp.message_type import MessageType
+
+logger = logging.getLogger(__name__)
+
+
+class ChatModel(QAbstractListModel):
+    """List model over a MessageLog that keeps at most ``max_pages`` pages of entries in memory.
+
+    Rows are fetched a page at a time when the view asks for them, so only the visible part
+    of the history (plus a few cached pages) is ever loaded, however long the log is.
+    While a query is set, only the newest ``search_limit`` matches are shown. Their pages are
+    numbered from the newest one and each is fetched by keyset, starting below the smallest
+    id of the previous (newer) page, which ``boundaries`` remembers. Search only sees flushed
+    entries up to ``searched_up_to``; messages appended meanwhile mark the results stale, and
+    ``refresh`` adds their matches after the next flush.
+    """
+
+    def __init__(self, message_log: MessageLog, page_size: int = 100, max_pages: int = 8,
+                 search_limit: int = 1000):
+        super(ChatModel, self).__init__()
+        self.message_log = message_log
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.search_limit = search_limit
+        self.pages = OrderedDict()
+        self.boundaries = [1]
+        self.searched_up_to = 0
+        self.stale = False
+        self.query = ""
+        self.row_count = self.message_log.count()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.row_count
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        entry = self.entry(index.row())
+        if entry is None:
+            return None
+        if role == Qt.ToolTipRole:
+            return entry.body
+        # Rows have a uniform height, so multi-line messages are shown on one line.
+        return " ".join(self.format_entry(entry).splitlines())
+
+    def entry(self, row: int) -> Optional[LogEntry]:
+        if self.query:
+            # Search pages are newest first, so count rows from the bottom of the view.
+            row = self.row_count - 1 - row
+        page_number, position = divmod(row, self.page_size)
+        page = self.page(page_number)
+        return page[position] if position < len(page) else None
+
+    def page(self, page_number: int) -> list:
+        page = self.pages.get(page_number)
+        if page is not None:
+            self.pages.move_to_end(page_number)
+            return page
+        if self.query:
+            while len(self.boundaries) <= page_number:
+                previous = self.page(len(self.boundaries) - 1)
+                if not previous:
+                    return []
+                self.boundaries.append(previous[-1].id)
+            page = self.message_log.search(self.query, self.boundaries[page_number], self.page_size)
+        else:
+            page = self.message_log.page(page_number * self.page_size, self.page_size)
+        self.pages[page_number] = page
+        if len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        logger.debug(f"Loaded chat page {page_number}")
+        return page
+
+    @staticmethod
+    def format_entry(entry: LogEntry) -> str:
+        sent_at = datetime.fromtimestamp(entry.timestamp)
+        time = sent_at.strftime("%H:%M:%S" if sent_at.date() == date.today() else "%Y-%m-%d %H:%M:%S")
+        if entry.kind == MessageType.FILE.name:
+            text = f"{'Sent' if entry.direction == SENT else 'Received'} file: {entry.body}"
+        else:
+            text = f"{'Me' if entry.direction == SENT else 'Peer'}: {entry.body}"
+        return f"[{time}] {text}"
+
+    def append(self, direction: str, kind: str, body: str) -> None:
+        self.message_log.append(direction, kind, body)
+        if self.query:
+            self.stale = True
+            return
+        row = self.row_count
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.row_count += 1
+        # The last page is partial and was cached without the new entry.
+        self.pages.pop(row // self.page_size, None)
+        self.endInsertRows()
+
+    def refresh(self) -> None:
+        """Add matches among entries flushed since the search ran. Call after ``MessageLog.flush``."""
+        if not self.stale:
+            return
+        added = self.message_log.count_matches(self.query, self.search_limit, self.searched_up_to)
+        self.searched_up_to = self.message_log.flushed_count
+        self.stale = bool(self.message_log.pending)
+        if not added:
+            return
+        self.beginInsertRows(QModelIndex(), self.row_count, self.row_count + added - 1)
+        self.row_count += added
+        # Every search page starts from the newest match, so all of them shift.
+        self.pages.clear()
+        self.boundaries = [self.searched_up_to + 1]
+        self.endInsertRows()
+
+    def set_query(self, query: str) -> None:
+        self.beginResetModel()
+        self.query = query.strip()
+        if self.query:
+            self.message_log.flush()
+            self.row_count = self.message_log.count_matches(self.query, self.search_limit)
+        else:
+            self.row_count = self.message_log.count()
+        self.searched_up_to = self.message_log.flushed_count
+        self.stale = False
+        self.pages.clear()
+        self.boundaries = [self.searched_up_to + 1]
+        self.endResetModel()
+        logger.debug(f"Chat filtered by '{self.query}': {self.row_count} entries")
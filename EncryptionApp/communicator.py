@@ -178,7 +178,7 @@ class Communicator:
         file.close()
         temp_file.close()
 
-        self.data_received_signal.emit(f"Received file: {file_name}")
+        self.data_received_signal.emit((MessageType.FILE, file_name))
         logger.info(f"Received file: {file_name}. Mode: {mode}")
 
     @cipher_utils.get_mode_and_cipher_to_receive
@@ -189,7 +189,7 @@ class Communicator:
         if mode in ["ECB", "CBC"]:
             decrypted_text = unpad(decrypted_text, AES.block_size)
 
-        self.data_received_signal.emit(str(decrypted_text, 'utf-8'))
+        self.data_received_signal.emit((MessageType.TEXT, str(decrypted_text, 'utf-8')))
 
         logger.debug(f"Received encrypted text: {encrypted_text}")
         logger.info(f"Received text: {str(decrypted_text, 'utf-8')}. Mode: {mode}")
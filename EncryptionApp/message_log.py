@@ -0,0 +1,126 @@
+import os
+import time
+import sqlite3
+import logging
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = "/history/"
+
+SENT = "sent"
+RECEIVED = "received"
+
+
+class LogEntry(NamedTuple):
+    id: int
+    timestamp: float
+    direction: str
+    kind: str
+    body: str
+
+
+def history_path(as_server: bool) -> str:
+    return os.getcwd() + HISTORY_DIR + f"{'server' if as_server else 'client'}_history.db"
+
+
+class MessageLog:
+    """Append-only SQLite log of sent and received text and file events.
+
+    Inserts are buffered and written in one transaction once ``batch_size``
+    entries are pending (or on ``flush``). Rows are never deleted, so ids are
+    contiguous and row ``n`` of the full history is the entry with id ``n + 1``.
+    This assumes the process is the only writer, so server and client use separate
+    files (see ``history_path``). Bodies are stored in plaintext. The default empty path
+    opens SQLite's private temporary database, which spills to an anonymous temp file
+    instead of growing in RAM and is deleted when the log is closed.
+    """
+
+    def __init__(self, path: str = "", batch_size: int = 32):
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.batch_size = batch_size
+        self.pending = []
+        self.conn = sqlite3.connect(path)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+        self.flushed_count = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+        logger.info(f"Opened message log {path or '(temporary)'} with {self.flushed_count} entries")
+
+    def create_schema(self) -> None:
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    timestamp REAL NOT NULL,
+                    direction TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    body TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                    USING fts5(body, content='messages', content_rowid='id', prefix='2 3');
+                CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts(rowid, body) VALUES (new.id, new.body);
+                END;
+            """)
+
+    def append(self, direction: str, kind: str, body: str) -> None:
+        self.pending.append((time.time(), direction, kind, body))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (timestamp, direction, kind, body) VALUES (?, ?, ?, ?)", self.pending)
+        self.flushed_count += len(self.pending)
+        logger.debug(f"Flushed {len(self.pending)} entries to message log")
+        self.pending = []
+
+    def count(self) -> int:
+        return self.flushed_count + len(self.pending)
+
+    def count_matches(self, query: str, limit: int, after_id: int = 0) -> int:
+        """Number of flushed entries matching ``query`` with id above ``after_id``, capped at ``limit``."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM messages_fts WHERE messages_fts MATCH ? AND rowid > ? "
+            "ORDER BY rowid DESC LIMIT ?)", (self.match_expression(query), after_id, limit)).fetchone()[0]
+
+    def page(self, offset: int, limit: int) -> List[LogEntry]:
+        # Entries that are not flushed yet are served from memory, so reading never forces a write.
+        rows = self.conn.execute(
+            "SELECT id, timestamp, direction, kind, body FROM messages "
+            "WHERE id > ? ORDER BY id LIMIT ?", (offset, limit))
+        entries = [LogEntry(*row) for row in rows]
+        start = max(offset, self.flushed_count) - self.flushed_count
+        for position, row in enumerate(self.pending[start:start + limit - len(entries)]):
+            entries.append(LogEntry(self.flushed_count + start + position + 1, *row))
+        return entries
+
+    def search(self, query: str, before_id: int, limit: int) -> List[LogEntry]:
+        """Up to ``limit`` newest flushed entries matching ``query`` with id below ``before_id``, newest first."""
+        rows = self.conn.execute(
+            "SELECT m.id, m.timestamp, m.direction, m.kind, m.body "
+            "FROM messages_fts JOIN messages AS m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? AND messages_fts.rowid < ? "
+            "ORDER BY messages_fts.rowid DESC LIMIT ?",
+            (self.match_expression(query), before_id, limit))
+        return [LogEntry(*row) for row in rows]
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        # Quote every word so user input is never parsed as FTS syntax. The last one matches
+        # as a prefix, unless it is a single character, which would expand to most of the index.
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if terms and len(query.split()[-1]) > 1:
+            terms[-1] += "*"
+        return " ".join(terms)
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+        logger.info("Closed message log")
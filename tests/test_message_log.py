@@ -0,0 +1,98 @@
+import pytest
+
+from EncryptionApp.message_log import MessageLog, SENT, RECEIVED
+
+
+def bodies(entries):
+    return [entry.body for entry in entries]
+
+
+def test_page_spans_flushed_and_pending_entries():
+    log = MessageLog(batch_size=100)
+    for i in range(5):
+        log.append(SENT, "TEXT", f"message {i}")
+    log.flush()
+    for i in range(5, 8):
+        log.append(RECEIVED, "TEXT", f"message {i}")
+
+    assert log.flushed_count == 5
+    assert log.count() == 8
+    entries = log.page(3, 4)
+    assert bodies(entries) == ["message 3", "message 4", "message 5", "message 6"]
+    assert [entry.id for entry in entries] == [4, 5, 6, 7]
+    assert bodies(log.page(6, 10)) == ["message 6", "message 7"]
+    assert log.page(8, 10) == []
+    assert len(log.pending) == 3
+
+
+def test_reopened_log_continues_ids(tmp_path):
+    path = str(tmp_path / "history" / "client_history.db")
+    log = MessageLog(path)
+    log.append(SENT, "TEXT", "first")
+    log.append(RECEIVED, "FILE", "report.pdf")
+    log.close()
+
+    log = MessageLog(path)
+    assert log.flushed_count == 2
+    log.append(SENT, "TEXT", "third")
+    log.flush()
+    entries = log.page(0, 10)
+    assert [entry.id for entry in entries] == [1, 2, 3]
+    assert bodies(entries) == ["first", "report.pdf", "third"]
+    assert entries[1].direction == RECEIVED and entries[1].kind == "FILE"
+    log.close()
+
+
+def test_search_pages_newest_first_by_keyset():
+    log = MessageLog()
+    for i in range(10):
+        log.append(SENT, "TEXT", f"needle {i}" if i % 2 == 0 else f"hay {i}")
+    log.flush()
+
+    first = log.search("needle", log.flushed_count + 1, 2)
+    assert bodies(first) == ["needle 8", "needle 6"]
+    second = log.search("needle", first[-1].id, 2)
+    assert bodies(second) == ["needle 4", "needle 2"]
+    last = log.search("needle", second[-1].id, 2)
+    assert bodies(last) == ["needle 0"]
+    assert log.search("needle", last[-1].id, 2) == []
+    assert log.count_matches("needle", 3) == 3
+    assert log.count_matches("needle", 10, after_id=5) == 2
+
+
+def test_search_ignores_pending_entries():
+    log = MessageLog(batch_size=100)
+    log.append(SENT, "TEXT", "needle")
+    assert log.count_matches("needle", 10) == 0
+    log.flush()
+    assert log.count_matches("needle", 10) == 1
+
+
+def test_search_matches_last_term_as_prefix():
+    log = MessageLog()
+    log.append(SENT, "TEXT", "encryption works")
+    log.flush()
+    assert log.count_matches("encry", 10) == 1
+    assert log.count_matches("encry works", 10) == 0
+    assert log.count_matches("e", 10) == 0
+
+
+@pytest.mark.parametrize("query, expected", [
+    ('"', 0),
+    ("*", 0),
+    ("-", 0),
+    ("AND", 1),
+    ("NOT", 1),
+    ("cats NOT", 1),
+    ("dogs -cats", 1),
+    ("NEAR(cats dogs)", 0),
+    ("body:cats", 0),
+    ('"quoted', 1),
+])
+def test_match_expression_treats_input_as_text(query, expected):
+    log = MessageLog()
+    log.append(SENT, "TEXT", 'cats AND dogs -cats NOT "quoted"')
+    log.append(SENT, "TEXT", "unrelated")
+    log.flush()
+    assert log.count_matches(query, 10) == expected
+    assert len(log.search(query, log.flushed_count + 1, 10)) == expected